@@ -0,0 +1,89 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "django-backend")
+PORT = int(os.environ.get("BENCH_PORT", 8765))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+EMAIL = os.environ.get("BENCH_EMAIL", "admin@example.com")
+PASSWORD = os.environ.get("BENCH_PASSWORD", "admin123")
+REQUESTS = int(os.environ.get("BENCH_REQUESTS", 2000))
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 16))
+
+SERVERS = {
+    "runserver": ["manage.py", "runserver", f"127.0.0.1:{PORT}", "--noreload"],
+    "serve": ["manage.py", "serve", "--bind", f"127.0.0.1:{PORT}"],
+}
+
+
+def wait_until_up(timeout=60):
+    """Return the seconds until the server answers its first request"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            urllib.request.urlopen(f"{BASE_URL}/api/auth/user/", timeout=1)
+        except urllib.error.HTTPError:
+            # Any HTTP response (401 here) means the app is serving
+            return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+        else:
+            return time.perf_counter() - started
+    raise RuntimeError("Server did not start in time")
+
+
+def login():
+    request = urllib.request.Request(
+        f"{BASE_URL}/api/auth/login/",
+        data=json.dumps({"email": EMAIL, "password": PASSWORD}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)["token"]
+
+
+def fetch_tasks(token):
+    request = urllib.request.Request(
+        f"{BASE_URL}/api/tasks/",
+        headers={"Authorization": f"Token {token}"},
+    )
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def benchmark(name):
+    """Start a server, measure startup time and GET /api/tasks/ throughput"""
+    process = subprocess.Popen(
+        [sys.executable] + SERVERS[name],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_until_up()
+        token = login()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            list(pool.map(lambda _: fetch_tasks(token), range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+        return startup, REQUESTS / elapsed
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    print(f"{REQUESTS} requests, concurrency {CONCURRENCY}")
+    for name in SERVERS:
+        startup, throughput = benchmark(name)
+        print(f"{name:>10}: startup {startup * 1000:7.0f} ms, {throughput:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
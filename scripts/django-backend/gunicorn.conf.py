@@ -0,0 +1,47 @@
+import multiprocessing
+import os
+
+# Production server configuration, used by `python manage.py serve`
+bind = os.environ.get('TASKFLOW_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('TASKFLOW_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('TASKFLOW_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Settings read this to split per-process admission limits across workers
+# (see WRITE_ADMISSION_* in settings.py); it must be set before preloading.
+os.environ['TASKFLOW_WORKERS'] = str(workers)
+
+# Load Django and the tasks app once in the master, then fork workers
+preload_app = True
+
+# Recycle workers after N requests (jittered so they don't all restart together)
+max_requests = int(os.environ.get('TASKFLOW_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Seconds a worker gets to finish in-flight requests on shutdown/reload
+graceful_timeout = 30
+timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('TASKFLOW_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # Never share a database connection opened in the master across forks
+    from django.db import connections
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    # A worker killed mid-request (e.g. on timeout) never released its
+    # writer slot; the gate is shared by all workers, so free it here
+    from tasks.admission import writer_gate
+    writer_gate.release_process(worker.pid)
+
+
+def post_worker_init(worker):
+    from tasks.warmup import warm_up
+    elapsed = warm_up()
+    worker.log.info('Worker %s warmed up in %.1f ms', worker.pid, elapsed * 1000)
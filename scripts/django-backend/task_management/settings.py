@@ -35,6 +35,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tasks.admission.WriteAdmissionMiddleware',
+    'tasks.profiling.SamplingProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'task_management.urls'
@@ -58,13 +60,41 @@ TEMPLATES = [
 WSGI_APPLICATION = 'task_management.wsgi.application'
 
 # Database
+# Connections are kept open between requests (and checked before reuse) so
+# the connection and pragmas set up when a worker warms up are not redone
+# on every request.
+CONN_MAX_AGE = 600
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional per-user sharding of projects and tasks across SQLite files.
+# 0 keeps everything in db.sqlite3; run `manage.py rebalance_shards` after
+# changing it.
+TASK_SHARDS = int(os.environ.get('TASKFLOW_TASK_SHARDS', 0))
+
+for shard in range(TASK_SHARDS):
+    DATABASES[f'shard_{shard}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard_{shard}.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+DATABASE_ROUTERS = ['tasks.sharding.ShardRouter'] if TASK_SHARDS else []
+
+# Sampling profiler: fraction of requests to profile (admins can also send
+# an `X-Profile: 1` header) and the stack sampling interval in seconds
+PROFILE_SAMPLE_RATE = float(os.environ.get('TASKFLOW_PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL = 0.005
+PROFILE_DIR = BASE_DIR / 'profiles'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,6 +141,21 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Write admission control (SQLite only allows one writer at a time).
+# The writer gate and the admission counters are shared by all workers
+# forked by `manage.py serve` (the app is preloaded), so MAX_CONCURRENT
+# bounds writers across the whole server.
+# The per-client rate limit is kept per process. It is divided across the
+# TASKFLOW_WORKERS processes, which only approximates a per-client limit:
+# a client whose requests all reach one worker gets RATE / workers, and
+# one spread evenly over the workers gets about RATE.
+SERVER_WORKERS = int(os.environ.get('TASKFLOW_WORKERS', 1))
+WRITE_ADMISSION_RATE = f'{max(1, 60 // SERVER_WORKERS)}/min'  # per client (token, session user or address)
+WRITE_ADMISSION_MAX_CLIENTS = 10000  # rate limit buckets kept in memory
+WRITE_ADMISSION_MAX_CONCURRENT = 4
+WRITE_ADMISSION_MAX_WAITING = 32
+WRITE_ADMISSION_TIMEOUT = 2.0  # seconds a write may wait for a slot
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
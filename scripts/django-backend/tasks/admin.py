@@ -1,15 +1,176 @@
 from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import Task, Project
+from .sharding import get_from_shards, shard_aliases, sharding_enabled
+
+def estimate_row_count(queryset):
+    """Planner's row estimate for the model's whole table, or None without statistics"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+            # -1 until the table is first vacuumed or analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # sqlite_stat1 only exists once ANALYZE has run. Each of its rows
+            # starts with the row count of one index, which is the table's
+            # row count for every index but a partial one.
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(counts) if counts else None
+    return None
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never runs an unbounded COUNT(*).
+
+    Lists count at most `max_count` matching rows. An unfiltered list that
+    reaches the cap shows the planner's estimate instead, when the table has
+    statistics (ANALYZE on SQLite; refresh them after bulk loads such as
+    rebalance_shards).
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        # Unordered so the bounded subquery can stop after max_count rows
+        count = self.object_list.order_by()[:self.max_count].count()
+        if count == self.max_count and not self.object_list.query.where:
+            estimate = estimate_row_count(self.object_list)
+            if estimate is not None and estimate > count:
+                return estimate
+        return count
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """Distinct-values filter whose SELECT DISTINCT runs at most once per timeout"""
+    timeout = 300
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        alias = model_admin.get_queryset(request).db
+        key = f'admin-filter:{model._meta.label}:{field_path}:{alias}'
+        self.lookup_choices = cache.get_or_set(key, lambda: list(self.lookup_choices), self.timeout)
+
+def selected_shard(value):
+    return value if value in shard_aliases() else shard_aliases()[0]
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Pick which shard the changelist shows when sharding is enabled"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def choices(self, changelist):
+        # No "All" entry: a changelist reads one shard at a time
+        selected = selected_shard(self.value())
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == selected,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        # ScalableModelAdmin.get_queryset has already picked the shard
+        return queryset
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Admin defaults for large tables.
+
+    With sharding enabled the admin is read-only: changelists browse one
+    shard at a time and change pages find rows on any shard. Writes go
+    through the /api/admin/ endpoints, which handle shard placement.
+    """
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) shown next to search results
+    show_full_result_count = False
+    # When sharded, joins must stay on one shard; users live on default and
+    # are prefetched from there instead
+    shard_select_related = ()
+    shard_prefetch_related = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if sharding_enabled():
+            alias = selected_shard(request.GET.get(ShardListFilter.parameter_name))
+            queryset = queryset.using(alias).prefetch_related(*self.shard_prefetch_related)
+        return queryset
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding_enabled():
+            return super().get_object(request, object_id, from_field)
+        try:
+            return get_from_shards(self.get_queryset(request), int(object_id))
+        except (self.model.DoesNotExist, ValueError):
+            return None
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if sharding_enabled():
+            return (ShardListFilter,) + tuple(list_filter)
+        return list_filter
+
+    def get_list_select_related(self, request):
+        if sharding_enabled():
+            return self.shard_select_related
+        return super().get_list_select_related(request)
+
+    def has_add_permission(self, request):
+        return not sharding_enabled() and super().has_add_permission(request)
+
+    def has_change_permission(self, request, obj=None):
+        return not sharding_enabled() and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not sharding_enabled() and super().has_delete_permission(request, obj)
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(ScalableModelAdmin):
     list_display = ('name', 'user', 'created_at')
-    list_filter = ('created_at', 'color')
-    search_fields = ('name', 'description')
+    list_select_related = ('user',)
+    shard_prefetch_related = ('user',)
+    list_filter = ('created_at', ('color', CachedAllValuesFieldListFilter))
+    # Prefix matches on the title/name only (served by the NOCASE indexes);
+    # descriptions are not searched, as no index can serve a substring scan
+    search_fields = ('^name',)
+    autocomplete_fields = ('user',)
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(ScalableModelAdmin):
     list_display = ('title', 'project', 'user', 'priority', 'status', 'due_date')
+    # Project.__str__ shows its owner, so join that user too
+    list_select_related = ('project__user', 'user')
+    shard_select_related = ('project',)
+    shard_prefetch_related = ('user', 'project__user')
     list_filter = ('priority', 'status', 'due_date', 'created_at')
-    search_fields = ('title', 'description')
-    date_hierarchy = 'due_date'
+    search_fields = ('^title',)
+    autocomplete_fields = ('project', 'user')
+    actions = ('mark_todo', 'mark_in_progress', 'mark_completed')
+
+    def _set_status(self, request, queryset, status):
+        # One UPDATE for the whole selection; update() skips auto_now
+        updated = queryset.update(status=status, updated_at=timezone.now())
+        self.message_user(request, f'{updated} task(s) updated.')
+
+    @admin.action(description='Mark selected tasks as to do', permissions=['change'])
+    def mark_todo(self, request, queryset):
+        self._set_status(request, queryset, 'todo')
+
+    @admin.action(description='Mark selected tasks as in progress', permissions=['change'])
+    def mark_in_progress(self, request, queryset):
+        self._set_status(request, queryset, 'in-progress')
+
+    @admin.action(description='Mark selected tasks as completed', permissions=['change'])
+    def mark_completed(self, request, queryset):
+        self._set_status(request, queryset, 'completed')
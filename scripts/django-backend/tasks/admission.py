@@ -0,0 +1,232 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import JsonResponse
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Counters exported through the admin admission stats endpoint. They live in
+# shared memory created at import time; `manage.py serve` preloads the app,
+# so every forked worker updates the same counters.
+STAT_NAMES = (
+    'writes_admitted',
+    'writes_throttled',
+    'writes_shed_queue_full',
+    'writes_shed_timeout',
+)
+_stats_lock = multiprocessing.Lock()
+_stats = multiprocessing.RawArray('q', len(STAT_NAMES))
+
+
+def _incr(name):
+    with _stats_lock:
+        _stats[STAT_NAMES.index(name)] += 1
+
+
+def admission_stats():
+    with _stats_lock:
+        stats = dict(zip(STAT_NAMES, _stats))
+    stats.update(writer_gate.snapshot())
+    # Rate limit buckets are per process; this is the answering worker's count
+    stats['rate_limited_clients'] = len(write_rate_limiter)
+    return stats
+
+
+class WriteRateLimiter:
+    """Per-client token buckets for write requests.
+
+    The rate (e.g. '60/min') sets both the bucket capacity and the refill
+    speed, so a client can burst up to the full rate and is then held to the
+    steady rate. At most `max_clients` buckets are kept; full buckets are
+    dropped first, then the least recently used ones.
+
+    Buckets are kept per process, so with several workers this is only an
+    approximation of a per-client limit (see WRITE_ADMISSION_RATE).
+    """
+
+    def __init__(self, rate, max_clients):
+        num, period = rate.split('/')
+        self.capacity = int(num)
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        self.refill_per_second = self.capacity / duration
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Take a token for `key`; return None, or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._evict(now)
+        if allowed:
+            return None
+        return (1 - tokens) / self.refill_per_second
+
+    def _evict(self, now):
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.refill_per_second >= self.capacity:
+                del self._buckets[key]
+        # Leave headroom so the scan above doesn't run on every new client
+        while len(self._buckets) > self.max_clients * 9 // 10:
+            self._buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def client_key(request):
+    """Identify the writer without touching the database.
+
+    Token clients are keyed by their token (one per user here), session users
+    by id and everyone else by the socket address; X-Forwarded-For is ignored
+    because clients can set it to anything.
+    """
+    auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(auth) == 2 and auth[0].lower() == 'token':
+        return f'token:{auth[1]}'
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class WriterGate:
+    """Bounded pool of concurrent writers with a bounded wait queue.
+
+    SQLite allows a single writer at a time; letting every write request
+    block on the database lock ties up all workers. Writers beyond
+    `max_concurrent` wait up to `timeout` seconds for a slot, and at most
+    `max_waiting` may wait at once. Everything else is shed immediately.
+
+    Slots are shared by every process forked after the gate is created.
+    Each slot records the pid holding it, so the slots of a worker that
+    died mid-request can be freed with `release_process`.
+    """
+
+    def __init__(self, max_concurrent, max_waiting, timeout):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._condition = multiprocessing.Condition()
+        self._holders = multiprocessing.RawArray('i', max_concurrent)
+        self._waiters = multiprocessing.RawArray('i', max_waiting)
+
+    @staticmethod
+    def _claim(slots):
+        for index, pid in enumerate(slots):
+            if not pid:
+                slots[index] = os.getpid()
+                return index
+        return None
+
+    def acquire(self):
+        """Return None once a slot is held, or the shed reason otherwise."""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if self._claim(self._holders) is not None:
+                return None
+            waiter = self._claim(self._waiters)
+            if waiter is None:
+                return 'writes_shed_queue_full'
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'writes_shed_timeout'
+                    self._condition.wait(remaining)
+                    if self._claim(self._holders) is not None:
+                        return None
+            finally:
+                self._waiters[waiter] = 0
+
+    def release(self):
+        pid = os.getpid()
+        with self._condition:
+            for index, holder in enumerate(self._holders):
+                if holder == pid:
+                    self._holders[index] = 0
+                    break
+            self._condition.notify()
+
+    def release_process(self, pid):
+        """Free every slot and queue place left behind by process `pid`"""
+        with self._condition:
+            for slots in (self._holders, self._waiters):
+                for index, holder in enumerate(slots):
+                    if holder == pid:
+                        slots[index] = 0
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'writers_active': sum(1 for pid in self._holders if pid),
+                'writers_waiting': sum(1 for pid in self._waiters if pid),
+                'max_concurrent_writers': self.max_concurrent,
+                'max_waiting_writers': self.max_waiting,
+            }
+
+
+write_rate_limiter = WriteRateLimiter(
+    rate=getattr(settings, 'WRITE_ADMISSION_RATE', '60/min'),
+    max_clients=getattr(settings, 'WRITE_ADMISSION_MAX_CLIENTS', 10000),
+)
+
+writer_gate = WriterGate(
+    max_concurrent=getattr(settings, 'WRITE_ADMISSION_MAX_CONCURRENT', 4),
+    max_waiting=getattr(settings, 'WRITE_ADMISSION_MAX_WAITING', 32),
+    timeout=getattr(settings, 'WRITE_ADMISSION_TIMEOUT', 2.0),
+)
+
+
+class WriteAdmissionMiddleware:
+    """Rate limit each client's writes, then admit them through `writer_gate`.
+
+    The per-client check comes first so one client's burst is turned away
+    with 429 before it can occupy writer slots other users need. Reads pass
+    straight through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+
+        wait = write_rate_limiter.acquire(client_key(request))
+        if wait is not None:
+            _incr('writes_throttled')
+            retry_after = max(1, math.ceil(wait))
+            response = JsonResponse(
+                {'detail': f'Request was throttled. Expected available in {retry_after} seconds.'},
+                status=429,
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+
+        reason = writer_gate.acquire()
+        if reason is not None:
+            _incr(reason)
+            response = JsonResponse(
+                {'error': 'Server is busy, please retry shortly'},
+                status=503,
+            )
+            response['Retry-After'] = str(max(1, math.ceil(writer_gate.timeout)))
+            return response
+
+        _incr('writes_admitted')
+        try:
+            return self.get_response(request)
+        finally:
+            writer_gate.release()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.profiling import clear_profiles, format_folded, load_profiles, load_route_profile
+
+
+class Command(BaseCommand):
+    help = 'List profiled routes, or print one route\'s collapsed stacks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('route', nargs='?', help='Route name, e.g. task-list-create')
+        parser.add_argument('--output', help='Write the collapsed stacks to this file')
+        parser.add_argument('--clear', action='store_true', help='Delete all recorded profiles')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_profiles()
+            self.stdout.write(self.style.SUCCESS('Profiles cleared'))
+            return
+
+        route = options['route']
+        if route is None:
+            for name, stacks in sorted(load_profiles().items()):
+                self.stdout.write(f'{name}: {sum(stacks.values())} samples')
+            return
+
+        stacks = load_route_profile(route)
+        if not stacks:
+            raise CommandError(f'No samples recorded for {route}')
+        folded = format_folded(stacks)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(folded)
+        else:
+            self.stdout.write(folded, ending='')
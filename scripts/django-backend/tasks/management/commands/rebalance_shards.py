@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+from tasks.models import Project, Task, TaskNotification
+from tasks.sharding import SHARD_ID_SPAN, shard_aliases, shard_for_user, sharding_enabled
+
+# Child tables first so deletes never leave orphaned rows behind
+MODELS = (TaskNotification, Task, Project)
+TABLES = tuple(model._meta.db_table for model in MODELS)
+BATCH_SIZE = 500
+
+# Rows to move for a batch of project owners. Tasks (and their
+# notifications) follow their project rather than their own user_id, so a
+# task's project is always on the same shard as the task.
+_PROJECTS = f'SELECT id FROM source.{Project._meta.db_table} WHERE user_id IN ({{users}})'
+_TASKS = f'SELECT id FROM source.{Task._meta.db_table} WHERE project_id IN ({_PROJECTS})'
+MOVE_FILTERS = {
+    Project._meta.db_table: 'user_id IN ({users})',
+    Task._meta.db_table: f'project_id IN ({_PROJECTS})',
+    TaskNotification._meta.db_table: f'task_id IN ({_TASKS})',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Migrate every shard, then move projects, with their tasks, (from '
+        'db.sqlite3 or other shards) onto the shard that owns their user. Each '
+        'batch commits on its own; rerun the command to resume after a failure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would move without changing anything')
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError('Sharding is disabled; set TASKFLOW_TASK_SHARDS first.')
+
+        dry_run = options['dry_run']
+        shards = shard_aliases()
+
+        if not dry_run:
+            for alias in shards:
+                call_command('migrate', 'tasks', database=alias, verbosity=0)
+            # Before any row moves, so new rows never take an id that a row
+            # still waiting to be moved (possibly on default) already has
+            self.reset_sequences(shards)
+
+        for source in [DEFAULT_DB_ALIAS] + shards:
+            moves = {}
+            for user_id in self.user_ids(source):
+                target = shard_for_user(user_id)
+                if target != source:
+                    moves.setdefault(target, []).append(user_id)
+
+            for target, user_ids in moves.items():
+                self.stdout.write(f'{source} -> {target}: {len(user_ids)} users')
+                if not dry_run:
+                    for start in range(0, len(user_ids), BATCH_SIZE):
+                        self.move(source, target, user_ids[start:start + BATCH_SIZE])
+
+        if not dry_run:
+            self.report_misplaced_tasks(shards)
+        self.stdout.write(self.style.SUCCESS('Rebalance complete'))
+
+    def user_ids(self, alias):
+        # Shards not migrated yet (only possible with --dry-run) hold no rows
+        if Project._meta.db_table not in connections[alias].introspection.table_names():
+            return []
+        return sorted(Project.objects.using(alias).values_list('user_id', flat=True).distinct())
+
+    def move(self, source, target, user_ids):
+        """Copy rows with their ids intact to `target`, then delete them from `source`.
+
+        Copies that an interrupted earlier run left in `target` are identical
+        to their source rows and are dropped before copying, so a rerun picks
+        up where that run stopped. Any other row with the same id is a real
+        collision and fails the batch.
+        """
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        connection = connections[target]
+        with connection.cursor() as cursor:
+            cursor.execute('ATTACH DATABASE %s AS source', [str(settings.DATABASES[source]['NAME'])])
+            try:
+                with transaction.atomic(using=target):
+                    for model in reversed(MODELS):
+                        table = model._meta.db_table
+                        columns = ', '.join(field.column for field in model._meta.concrete_fields)
+                        where = MOVE_FILTERS[table].format(users=placeholders)
+                        # INTERSECT compares every column, treating NULLs as equal
+                        cursor.execute(
+                            f'DELETE FROM main.{table} WHERE id IN (SELECT id FROM ('
+                            f'SELECT {columns} FROM main.{table} INTERSECT '
+                            f'SELECT {columns} FROM source.{table} WHERE {where}))',
+                            user_ids,
+                        )
+                        cursor.execute(
+                            f'INSERT INTO main.{table} ({columns}) '
+                            f'SELECT {columns} FROM source.{table} WHERE {where}',
+                            user_ids,
+                        )
+                    for table in TABLES:
+                        where = MOVE_FILTERS[table].format(users=placeholders)
+                        cursor.execute(f'DELETE FROM source.{table} WHERE {where}', user_ids)
+            finally:
+                cursor.execute('DETACH DATABASE source')
+
+    def reset_sequences(self, shards):
+        """Point each shard's id sequence past every id already used in its range"""
+        for index, alias in enumerate(shards):
+            low, high = index * SHARD_ID_SPAN, (index + 1) * SHARD_ID_SPAN
+            for table in TABLES:
+                used = [low]
+                # Rows not moved yet still sit on default (or another shard)
+                for other in [DEFAULT_DB_ALIAS] + shards:
+                    with connections[other].cursor() as cursor:
+                        cursor.execute(
+                            f'SELECT MAX(id) FROM {table} WHERE id >= %s AND id < %s',
+                            [low, high],
+                        )
+                        used.append(cursor.fetchone()[0] or low)
+                with connections[alias].cursor() as cursor:
+                    # Never hand out ids of rows that were deleted
+                    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                    used.extend(seq for seq, in cursor.fetchall() if low <= seq < high)
+                    cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [table])
+                    cursor.execute(
+                        'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                        [table, max(used)],
+                    )
+
+    def report_misplaced_tasks(self, shards):
+        """Warn about tasks whose user differs from their project's owner"""
+        for alias in shards:
+            misplaced = (
+                Task.objects.using(alias)
+                .exclude(user_id=F('project__user_id'))
+                .values_list('user_id', flat=True)
+            )
+            count = sum(1 for user_id in misplaced if shard_for_user(user_id) != alias)
+            if count:
+                self.stdout.write(self.style.WARNING(
+                    f'{alias}: {count} tasks belong to a user on another shard; '
+                    'they stay with their project and are only visible to admins'
+                ))
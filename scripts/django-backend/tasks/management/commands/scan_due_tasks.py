@@ -0,0 +1,118 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from tasks.models import ScanCheckpoint, Task, TaskNotification
+from tasks.sharding import shard_aliases
+
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Record "due soon" and "overdue" notifications for tasks whose due date '
+        'entered the window, or that were created or rescheduled into it, '
+        'since the last run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-days', type=int, default=1,
+                            help='Notify this many days before the due date (default 1)')
+        parser.add_argument('--backfill-days', type=int, default=1,
+                            help='Days of past due dates the first run covers (default 1)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=int,
+                            help='Keep running, rescanning every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            for alias in shard_aliases():
+                self.scan(alias, date.today(), options)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def scan(self, alias, today, options):
+        started = timezone.now()
+        yesterday = today - timedelta(days=1)
+        initial = yesterday - timedelta(days=options['backfill_days'])
+        batch_size = options['batch_size']
+
+        # Each kind covers due dates in (floor, end]. The checkpoint's value
+        # is how far that range has been scanned, so only the slice that
+        # became due since the previous run is read by due date. Tasks
+        # created or rescheduled into the scanned part since then are found
+        # through updated_at instead.
+        for kind, floor, end in (
+            ('due_soon', yesterday, today + timedelta(days=options['lead_days'])),
+            ('overdue', None, yesterday),
+        ):
+            checkpoint, _ = ScanCheckpoint.objects.get_or_create(
+                name=f'scan_due_tasks:{kind}:{alias}',
+                defaults={
+                    'value': yesterday if kind == 'due_soon' else initial,
+                    'updated_through': started,
+                },
+            )
+            tasks = Task.objects.using(alias).exclude(status='completed')
+
+            changed = 0
+            if checkpoint.updated_through is not None:
+                covered = tasks.filter(
+                    updated_at__gt=checkpoint.updated_through,
+                    due_date__lte=min(checkpoint.value, end),
+                )
+                if floor is not None:
+                    covered = covered.filter(due_date__gt=floor)
+                changed = self.record(alias, kind, covered, 'updated_at', batch_size)
+
+            due = 0
+            if checkpoint.value < end:
+                # After missed runs the checkpoint can lag behind the floor;
+                # tasks due before it are no longer "due soon"
+                start = checkpoint.value if floor is None else max(checkpoint.value, floor)
+                due = self.record(
+                    alias, kind,
+                    tasks.filter(due_date__gt=start, due_date__lte=end),
+                    'due_date', batch_size,
+                )
+                checkpoint.value = end
+
+            # Overlap the next run with this one so saves that were still
+            # uncommitted when it started are not skipped
+            checkpoint.updated_through = started - WATERMARK_OVERLAP
+            checkpoint.save(update_fields=['value', 'updated_through'])
+            if due or changed:
+                self.stdout.write(
+                    f'{alias} {kind}: {due} tasks due up to {checkpoint.value}, '
+                    f'{changed} changed since the last run'
+                )
+
+    def record(self, alias, kind, queryset, key, batch_size):
+        """Walk `queryset` in (key, id) order, one batch at a time"""
+        queryset = queryset.order_by(key, 'id').values_list('id', 'user_id', 'due_date', key)
+        recorded = 0
+        last = None
+        while True:
+            batch = queryset
+            if last is not None:
+                last_key, last_id = last
+                batch = batch.filter(Q(**{f'{key}__gt': last_key}) | Q(**{key: last_key, 'id__gt': last_id}))
+            rows = list(batch[:batch_size])
+            if not rows:
+                return recorded
+
+            # Rerunning a slice is harmless: (task, kind) is unique
+            TaskNotification.objects.using(alias).bulk_create(
+                [
+                    TaskNotification(task_id=task_id, user_id=user_id, kind=kind, due_date=due_date)
+                    for task_id, user_id, due_date, _ in rows
+                ],
+                ignore_conflicts=True,
+            )
+            recorded += len(rows)
+            task_id, _, _, last_key = rows[-1]
+            last = (last_key, task_id)
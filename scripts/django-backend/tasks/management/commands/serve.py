@@ -0,0 +1,33 @@
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run the API with preforked, pre-warmed gunicorn workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', help='Address to listen on (default 0.0.0.0:8000)')
+        parser.add_argument('--workers', type=int, help='Worker processes (default 2 * cores + 1)')
+        parser.add_argument('--threads', type=int, help='Threads per worker (default 1)')
+        parser.add_argument('--max-requests', type=int,
+                            help='Recycle a worker after this many requests (default 1000)')
+
+    def handle(self, *args, **options):
+        for option, env in (
+            ('bind', 'TASKFLOW_BIND'),
+            ('workers', 'TASKFLOW_WORKERS'),
+            ('threads', 'TASKFLOW_THREADS'),
+            ('max_requests', 'TASKFLOW_MAX_REQUESTS'),
+        ):
+            if options[option] is not None:
+                os.environ[env] = str(options[option])
+
+        config = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        argv = [sys.executable, '-m', 'gunicorn', '-c', config, 'task_management.wsgi:application']
+        self.stdout.write(f"Starting gunicorn: {' '.join(argv[2:])}")
+        # Replace this process so gunicorn's master receives signals directly
+        os.chdir(settings.BASE_DIR)
+        os.execv(sys.executable, argv)
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Enforce unique emails in the database instead of a query per registration.
+
+    Blank emails (e.g. superusers created without one) are left out of the
+    unique index. Login looks users up by email, which a partial index can't
+    serve, so email also gets a plain index.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tasks', '0002_user_fk_without_db_constraint'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX tasks_auth_user_email_uniq ON auth_user (email) WHERE email <> ''",
+            "DROP INDEX tasks_auth_user_email_uniq",
+            hints={'default_only': True},
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX tasks_auth_user_email_idx ON auth_user (email)",
+            "DROP INDEX tasks_auth_user_email_idx",
+            hints={'default_only': True},
+        ),
+    ]
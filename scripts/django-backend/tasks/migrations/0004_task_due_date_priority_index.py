@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_auth_user_email_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date', '-priority'], name='task_due_date_priority_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0004_task_due_date_priority_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due_soon', 'Due Soon'), ('overdue', 'Overdue')], max_length=10)),
+                ('due_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date', 'id'], name='task_due_date_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='tasknotification',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='tasks.task'),
+        ),
+        migrations.AddField(
+            model_name='tasknotification',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='task_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['id'], name='notification_pending_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tasknotification',
+            unique_together={('task', 'kind')},
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:36
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(django.db.models.functions.comparison.Collate('name', 'nocase'), name='project_name_nocase_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(django.db.models.functions.comparison.Collate('title', 'nocase'), name='task_title_nocase_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_search_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scancheckpoint',
+            name='updated_through',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['updated_at', 'id'], name='task_updated_at_id_idx'),
+        ),
+    ]
@@ -1,18 +1,37 @@
+from datetime import date
 from django.db import models
+from django.db.models.functions import Collate
 from django.contrib.auth.models import User
 from django.core.validators import MinLengthValidator
+from .sharding import shard_for_user
+
+class ShardedQuerySet(models.QuerySet):
+    def on_shard(self, user_id):
+        """Run against the shard holding `user_id`'s rows (default when unsharded)"""
+        return self.using(shard_for_user(user_id))
+
+    def for_user(self, user):
+        return self.on_shard(user.pk).filter(user=user)
 
 class Project(models.Model):
     name = models.CharField(max_length=200, validators=[MinLengthValidator(1)])
     description = models.TextField(blank=True, null=True)
     color = models.CharField(max_length=50, default='blue')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects')
+    # No db constraint: users stay on the default database when sharding
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projects', db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         unique_together = ['name', 'user']
+        indexes = [
+            # Case-insensitive prefix search (admin ^name); SQLite only uses
+            # an index for LIKE when its collation is NOCASE
+            models.Index(Collate('name', 'nocase'), name='project_name_nocase_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
@@ -40,17 +59,65 @@ class Task(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='todo')
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tasks')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks', db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ['due_date', '-priority']
+        indexes = [
+            # Serves the default ordering (admin changelist) and due-date ranges
+            models.Index(fields=['due_date', '-priority'], name='task_due_date_priority_idx'),
+            # Keyset pagination for the due date scanner
+            models.Index(fields=['due_date', 'id'], name='task_due_date_id_idx'),
+            # Keyset pagination over recently changed tasks
+            models.Index(fields=['updated_at', 'id'], name='task_updated_at_id_idx'),
+            # Case-insensitive prefix search (admin ^title)
+            models.Index(Collate('title', 'nocase'), name='task_title_nocase_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
     @property
     def is_overdue(self):
-        from datetime import date
         return self.status != 'completed' and self.due_date < date.today()
+
+class TaskNotification(models.Model):
+    """Outbox of due date events recorded by the scan_due_tasks command"""
+    KIND_CHOICES = [
+        ('due_soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='notifications')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_notifications', db_constraint=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    due_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        unique_together = ['task', 'kind']
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(delivered_at__isnull=True),
+                         name='notification_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.task_id}"
+
+class ScanCheckpoint(models.Model):
+    """High-water mark of the last due date a scanner has fully processed"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateField()
+    # Rows changed up to this time have been checked against the covered dates
+    updated_through = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
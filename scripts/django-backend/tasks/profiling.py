@@ -0,0 +1,157 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+FOLDED_SUFFIX = '.folded'
+
+# Per-route collapsed stack counts for this process
+_lock = threading.Lock()
+_profiles = {}
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def _route_slug(route):
+    return re.sub(r'[^\w.-]', '_', route)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Sample one thread's stack every `interval` seconds from a helper thread.
+
+    Unlike cProfile this adds no per-call overhead to the profiled thread.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def record_profile(route, stacks):
+    """Merge a request's samples into the route's totals and persist them"""
+    # The file is written under the lock too: threads share its temporary
+    # name, and a later snapshot must not be overwritten by an older one
+    with _lock:
+        totals = _profiles.setdefault(route, Counter())
+        totals.update(stacks)
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        # One file per route and process; readers merge them
+        path = directory / f'{_route_slug(route)}.{os.getpid()}{FOLDED_SUFFIX}'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(format_folded(totals))
+        os.replace(tmp_path, path)
+
+
+def load_profiles():
+    """Return {route: Counter(stack -> samples)} merged across processes"""
+    merged = {}
+    directory = profile_dir()
+    if not directory.is_dir():
+        return merged
+    for path in directory.glob(f'*{FOLDED_SUFFIX}'):
+        route = path.name[:-len(FOLDED_SUFFIX)].rsplit('.', 1)[0]
+        stacks = merged.setdefault(route, Counter())
+        for line in path.read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return merged
+
+
+def load_route_profile(route):
+    return load_profiles().get(_route_slug(route), Counter())
+
+
+def format_folded(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def clear_profiles():
+    with _lock:
+        _profiles.clear()
+    directory = profile_dir()
+    if directory.is_dir():
+        for path in directory.glob(f'*{FOLDED_SUFFIX}'):
+            path.unlink()
+
+
+def _requested_by_admin(request):
+    # Token auth normally runs inside DRF views, after middleware
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        user = result[0] if result else None
+    return user is not None and user.is_staff
+
+
+class SamplingProfilerMiddleware:
+    """Profile PROFILE_SAMPLE_RATE of requests, plus admin requests sending X-Profile: 1"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.interval = settings.PROFILE_INTERVAL
+
+    def __call__(self, request):
+        if not (
+            (self.sample_rate and random.random() < self.sample_rate)
+            or (request.META.get(PROFILE_HEADER) == '1' and _requested_by_admin(request))
+        ):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+            match = getattr(request, 'resolver_match', None)
+            route = (match.view_name if match else None) or 'unresolved'
+            record_profile(route, stacks)
+        response['X-Profile-Route'] = route
+        response['X-Profile-Duration-Ms'] = f'{(time.perf_counter() - started) * 1000:.1f}'
+        return response
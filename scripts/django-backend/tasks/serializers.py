@@ -1,7 +1,44 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 from .models import Task, Project
+from .sharding import get_from_shards, sharding_enabled, shard_for_user
+
+def is_unique_violation(exc, *columns):
+    """Whether `exc` was raised by the unique constraint covering `columns`"""
+    message = str(exc).lower()
+    return 'unique' in message and all(column in message for column in columns)
+
+class ShardedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key lookup that searches every shard for the related row"""
+
+    def to_internal_value(self, data):
+        try:
+            return get_from_shards(self.get_queryset(), pk=data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class ShardedSerializerMixin:
+    """Create instances on their owner's shard and keep them there"""
+
+    def create(self, validated_data):
+        user = validated_data.get('user')
+        if user is None:
+            return super().create(validated_data)
+        return self.Meta.model.objects.on_shard(user.pk).create(**validated_data)
+
+    def validate_owner_shard(self, user):
+        # Rows are not moved between shards on update; rebalance_shards does that
+        if (sharding_enabled() and self.instance is not None and user is not None
+                and shard_for_user(user.pk) != shard_for_user(self.instance.user_id)):
+            raise serializers.ValidationError(
+                {'user': "Can't reassign to a user on another shard."}
+            )
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -12,16 +49,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('username', 'email', 'first_name', 'last_name', 'password', 'password_confirm')
-
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this email already exists.")
-        return value
-
-    def validate_username(self, value):
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("A user with this username already exists.")
-        return value
+        # Uniqueness is enforced by the database (see create), not by lookups
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
 
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
@@ -34,13 +63,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         if not validated_data.get('username'):
             validated_data['username'] = validated_data['email']
         
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            password=validated_data['password']
-        )
+        try:
+            # The savepoint keeps an enclosing transaction usable after a failure
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=validated_data['username'],
+                    email=validated_data['email'],
+                    first_name=validated_data['first_name'],
+                    last_name=validated_data['last_name'],
+                    password=validated_data['password']
+                )
+        except IntegrityError as exc:
+            if is_unique_violation(exc, 'email'):
+                raise serializers.ValidationError({'email': ["A user with this email already exists."]})
+            if is_unique_violation(exc, 'username'):
+                raise serializers.ValidationError({'username': ["A user with that username already exists."]})
+            raise
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -79,7 +117,7 @@ class UserSerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip() or obj.username
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(ShardedSerializerMixin, serializers.ModelSerializer):
     task_count = serializers.ReadOnlyField()
     user_name = serializers.CharField(source='user.username', read_only=True)
 
@@ -87,28 +125,38 @@ class ProjectSerializer(serializers.ModelSerializer):
         model = Project
         fields = ('id', 'name', 'description', 'color', 'created_at', 'task_count', 'user', 'user_name')
         read_only_fields = ('created_at', 'task_count', 'user')
+        # Duplicate names are caught by unique_together in the database
+        validators = []
+
+    duplicate_name_error = {'name': ["You already have a project with this name."]}
 
     def create(self, validated_data):
         # For regular users, set the user to the request user
         if not self.context['request'].user.is_staff:
             validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
-
-    def validate_name(self, value):
-        user = self.context['request'].user
-        # Check for duplicate project names for the same user
-        if self.instance:
-            # Update case - exclude current instance
-            if Project.objects.filter(name=value, user=user).exclude(id=self.instance.id).exists():
-                raise serializers.ValidationError("You already have a project with this name.")
-        else:
-            # Create case
-            if not user.is_staff:
-                if Project.objects.filter(name=value, user=user).exists():
-                    raise serializers.ValidationError("You already have a project with this name.")
-        return value
-
-class TaskSerializer(serializers.ModelSerializer):
+        user = validated_data.get('user')
+        using = shard_for_user(user.pk) if user is not None else None
+        try:
+            with transaction.atomic(using=using):
+                return super().create(validated_data)
+        except IntegrityError as exc:
+            self.raise_duplicate_name(exc)
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic(using=instance._state.db):
+                return super().update(instance, validated_data)
+        except IntegrityError as exc:
+            self.raise_duplicate_name(exc)
+
+    def raise_duplicate_name(self, exc):
+        # Anything but the (name, user) constraint is a real error
+        if is_unique_violation(exc, 'name', 'user_id'):
+            raise serializers.ValidationError(self.duplicate_name_error)
+        raise exc
+
+class TaskSerializer(ShardedSerializerMixin, serializers.ModelSerializer):
+    project = ShardedPrimaryKeyRelatedField(queryset=Project.objects.all())
     project_name = serializers.CharField(source='project.name', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
     is_overdue = serializers.ReadOnlyField()
@@ -128,7 +176,7 @@ class TaskSerializer(serializers.ModelSerializer):
     def validate_project(self, value):
         user = self.context['request'].user
         # For regular users, ensure they can only assign tasks to their own projects
-        if not user.is_staff and value.user != user:
+        if not user.is_staff and value.user_id != user.id:
             raise serializers.ValidationError("You can only assign tasks to your own projects")
         return value
 
@@ -138,7 +186,26 @@ class AdminProjectSerializer(ProjectSerializer):
         fields = ProjectSerializer.Meta.fields
         read_only_fields = ('created_at', 'task_count')
 
+    def validate(self, attrs):
+        self.validate_owner_shard(attrs.get('user'))
+        return attrs
+
 class AdminTaskSerializer(TaskSerializer):
     class Meta(TaskSerializer.Meta):
         fields = TaskSerializer.Meta.fields
         read_only_fields = ('created_at', 'updated_at', 'is_overdue')
+
+    def validate(self, attrs):
+        user = attrs.get('user')
+        self.validate_owner_shard(user)
+        if not sharding_enabled() or ('user' not in attrs and 'project' not in attrs):
+            return attrs
+        project = attrs.get('project') or (self.instance.project if self.instance else None)
+        owner_id = user.pk if user else (self.instance.user_id if self.instance else None)
+        # Tasks are stored with their project and looked up by their user, so
+        # both must be the same user or rebalancing would split them
+        if project is not None and owner_id is not None and project.user_id != owner_id:
+            raise serializers.ValidationError(
+                {'project': "Task and project must belong to the same user."}
+            )
+        return attrs
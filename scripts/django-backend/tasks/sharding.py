@@ -0,0 +1,121 @@
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS
+
+# Models whose rows live on the owning user's shard
+SHARDED_MODELS = ('project', 'task', 'tasknotification')
+
+# Each shard allocates primary keys from its own range so ids stay unique
+# across shards and the admin views can address rows by id alone.
+SHARD_ID_SPAN = 10 ** 12
+
+
+def sharding_enabled():
+    return settings.TASK_SHARDS > 0
+
+
+def shard_aliases():
+    if not sharding_enabled():
+        return [DEFAULT_DB_ALIAS]
+    return [f'shard_{i}' for i in range(settings.TASK_SHARDS)]
+
+
+def shard_for_user(user_id):
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    return f'shard_{user_id % settings.TASK_SHARDS}'
+
+
+def shard_for_pk(pk):
+    """Shard that allocated `pk`, or None if it is outside every shard's range"""
+    index = int(pk) // SHARD_ID_SPAN
+    if 0 <= index < settings.TASK_SHARDS:
+        return f'shard_{index}'
+    return None
+
+
+def is_sharded_model(model):
+    return model._meta.app_label == 'tasks' and model._meta.model_name in SHARDED_MODELS
+
+
+class ShardRouter:
+    """Route projects and tasks to their owner's shard, everything else to default."""
+
+    def _db_for_model(self, model, **hints):
+        if not is_sharded_model(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._state.db and is_sharded_model(type(instance)):
+                return instance._state.db
+            if instance._meta.label == settings.AUTH_USER_MODEL:
+                return shard_for_user(instance.pk)
+            user_id = getattr(instance, 'user_id', None)
+            if user_id is not None:
+                return shard_for_user(user_id)
+        return None
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users live on default and are referenced without a db constraint
+        if not (is_sharded_model(type(obj1)) and is_sharded_model(type(obj2))):
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            # Default keeps the tasks tables as the source for rebalance_shards
+            return True
+        # Raw SQL migrations against other apps' tables pass default_only
+        return app_label == 'tasks' and not hints.get('default_only', False)
+
+
+def fan_out(queryset, limit=None, aliases=None):
+    """Evaluate `queryset` on every shard (or `aliases`) and merge the rows in its ordering."""
+    if not sharding_enabled():
+        return queryset[:limit] if limit is not None else queryset
+
+    results = []
+    for alias in aliases or shard_aliases():
+        shard_queryset = queryset.using(alias)
+        if limit is not None:
+            shard_queryset = shard_queryset[:limit]
+        results.extend(shard_queryset)
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    # Stable sorts applied from the least significant key to the most
+    for field in reversed(ordering):
+        descending = field.startswith('-')
+        results.sort(key=attrgetter(field.lstrip('-')), reverse=descending)
+
+    return results[:limit] if limit is not None else results
+
+
+def fan_out_count(queryset):
+    if not sharding_enabled():
+        return queryset.count()
+    return sum(queryset.using(alias).count() for alias in shard_aliases())
+
+
+def get_from_shards(queryset, pk):
+    """Fetch a single row by primary key, checking its allocating shard first."""
+    if not sharding_enabled():
+        return queryset.get(pk=pk)
+
+    aliases = shard_aliases()
+    home = shard_for_pk(pk)
+    if home is not None:
+        aliases.remove(home)
+        aliases.insert(0, home)
+    for alias in aliases:
+        try:
+            return queryset.using(alias).get(pk=pk)
+        except ObjectDoesNotExist:
+            continue
+    raise queryset.model.DoesNotExist(
+        f'{queryset.model._meta.object_name} matching query does not exist.'
+    )
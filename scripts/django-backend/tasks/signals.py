@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .sharding import sharding_enabled
+
+SQLITE_PRAGMAS = (
+    # Readers don't block the writer and vice versa
+    'PRAGMA journal_mode=WAL',
+    # Safe with WAL, avoids an fsync on every commit
+    'PRAGMA synchronous=NORMAL',
+    # Wait for the write lock instead of failing with "database is locked"
+    'PRAGMA busy_timeout=5000',
+)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_rows(sender, instance, **kwargs):
+    # The cascade from User only reaches the default database
+    if not sharding_enabled():
+        return
+    from .models import Project, Task
+    Task.objects.on_shard(instance.pk).filter(user_id=instance.pk).delete()
+    Project.objects.on_shard(instance.pk).filter(user_id=instance.pk).delete()
@@ -0,0 +1,395 @@
+from contextlib import ExitStack
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .admin import EstimatedCountPaginator
+from .management.commands.rebalance_shards import Command as RebalanceCommand
+from .management.commands.scan_due_tasks import Command as ScanDueTasksCommand
+from .models import Project, ScanCheckpoint, ShardedQuerySet, Task, TaskNotification
+from .sharding import (
+    fan_out, get_from_shards, shard_aliases, shard_for_pk, shard_for_user, sharding_enabled,
+)
+
+# Sharding tests need the shard databases, which settings only declare when
+# TASKFLOW_TASK_SHARDS is set: TASKFLOW_TASK_SHARDS=2 python manage.py test tasks
+requires_shards = skipUnless(settings.TASK_SHARDS >= 2, 'set TASKFLOW_TASK_SHARDS=2')
+
+# Savepoints from transaction.atomic() are not part of a request's work
+TRANSACTION_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def reserve_shard_ids():
+    """Give each shard its own id range, as rebalance_shards does"""
+    if sharding_enabled():
+        RebalanceCommand().reset_sequences(shard_aliases())
+
+
+def capture_queries(test, func):
+    """Run `func` and return its result and the SQL it ran on every database"""
+    with ExitStack() as stack:
+        contexts = [stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in test.databases]
+        result = func()
+    queries = [
+        query['sql'] for context in contexts for query in context.captured_queries
+        if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+    ]
+    return result, queries
+
+
+class WriteQueryCountTests(TestCase):
+    """Writes rely on database constraints instead of lookups, so their
+    query counts stay flat. A new query on any of these paths should be a
+    deliberate change."""
+    databases = set(settings.DATABASES)
+
+    def setUp(self):
+        reserve_shard_ids()
+        self.client = APIClient()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'secret12')
+        self.project = Project.objects.on_shard(self.user.pk).create(name='Work', user=self.user)
+
+    def assertNumWriteQueries(self, num, func):
+        response, queries = capture_queries(self, func)
+        self.assertEqual(len(queries), num, '\n'.join(queries))
+        return response
+
+    def registration(self, **overrides):
+        data = {
+            'username': 'bob',
+            'email': 'bob@example.com',
+            'first_name': 'Bob',
+            'last_name': 'Smith',
+            'password': 'secret12',
+            'password_confirm': 'secret12',
+        }
+        data.update(overrides)
+        return data
+
+    def test_register(self):
+        # User, token and default project inserts
+        response = self.assertNumWriteQueries(3, lambda: self.client.post(
+            '/api/auth/register/', self.registration(), format='json'))
+        self.assertEqual(response.status_code, 201)
+
+    def test_register_duplicate_email(self):
+        response = self.client.post(
+            '/api/auth/register/', self.registration(email='alice@example.com'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+
+    def test_register_duplicate_username(self):
+        response = self.client.post(
+            '/api/auth/register/', self.registration(username='alice'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.json())
+
+    def test_project_create(self):
+        self.client.force_authenticate(self.user)
+        # Insert, then the task_count of the new project
+        response = self.assertNumWriteQueries(2, lambda: self.client.post(
+            '/api/projects/', {'name': 'Home'}, format='json'))
+        self.assertEqual(response.status_code, 201)
+
+    def test_project_duplicate_name(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/projects/', {'name': 'Work'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'name': ['You already have a project with this name.']})
+
+    def test_project_rename_to_duplicate_name(self):
+        other = Project.objects.on_shard(self.user.pk).create(name='Home', user=self.user)
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(f'/api/projects/{other.pk}/', {'name': 'Work'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.json())
+
+    def test_project_create_reraises_other_integrity_errors(self):
+        client = APIClient(raise_request_exception=True)
+        client.force_authenticate(self.user)
+        error = IntegrityError('CHECK constraint failed: color')
+        with mock.patch.object(ShardedQuerySet, 'create', side_effect=error), \
+                self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaisesMessage(IntegrityError, 'CHECK constraint failed'):
+            client.post('/api/projects/', {'name': 'Home'}, format='json')
+
+    def test_project_update_reraises_other_integrity_errors(self):
+        client = APIClient(raise_request_exception=True)
+        client.force_authenticate(self.user)
+        error = IntegrityError('CHECK constraint failed: color')
+        with mock.patch.object(Project, 'save', side_effect=error), \
+                self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaisesMessage(IntegrityError, 'CHECK constraint failed'):
+            client.patch(f'/api/projects/{self.project.pk}/', {'name': 'Home'}, format='json')
+
+    def test_task_create(self):
+        self.client.force_authenticate(self.user)
+        # Project lookup and insert
+        response = self.assertNumWriteQueries(2, lambda: self.client.post(
+            '/api/tasks/',
+            {'title': 'Write report', 'due_date': '2030-01-01', 'project': self.project.pk},
+            format='json',
+        ))
+        self.assertEqual(response.status_code, 201)
+
+    def test_task_update(self):
+        task = Task.objects.on_shard(self.user.pk).create(
+            title='Write report', due_date='2030-01-01', project=self.project, user=self.user)
+        self.client.force_authenticate(self.user)
+        # Task lookup, update, and the user for user_name
+        response = self.assertNumWriteQueries(3, lambda: self.client.patch(
+            f'/api/tasks/{task.pk}/', {'status': 'completed'}, format='json'))
+        self.assertEqual(response.status_code, 200)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('alice')
+        # Sparse ids, as rebalance_shards leaves them
+        for pk in (3, 10 ** 12 + 1, 10 ** 12 + 2):
+            Project.objects.create(pk=pk, name=f'Project {pk}', user=user)
+
+    def paginator(self, queryset, max_count):
+        paginator = EstimatedCountPaginator(queryset, 10)
+        paginator.max_count = max_count
+        return paginator
+
+    def test_counts_small_tables_exactly(self):
+        self.assertEqual(self.paginator(Project.objects.all(), 100).count, 3)
+
+    def test_large_table_without_statistics_is_capped(self):
+        self.assertEqual(self.paginator(Project.objects.all(), 2).count, 2)
+
+    def test_large_table_uses_statistics(self):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(self.paginator(Project.objects.all(), 2).count, 3)
+        # Filtered lists never use the whole table's estimate
+        filtered = Project.objects.filter(name__startswith='Project')
+        self.assertEqual(self.paginator(filtered, 2).count, 2)
+
+
+class ScanDueTasksTests(TestCase):
+    databases = set(settings.DATABASES)
+    today = date(2030, 6, 15)
+    options = {'lead_days': 1, 'backfill_days': 1, 'batch_size': 2}
+
+    def setUp(self):
+        user = User.objects.create_user('alice')
+        self.project = Project.objects.on_shard(user.pk).create(name='Work', user=user)
+
+    def task(self, due_date, **fields):
+        return self.project.tasks.create(
+            title='Task', due_date=due_date, user=self.project.user, **fields)
+
+    def scan(self, today):
+        command = ScanDueTasksCommand(stdout=StringIO())
+        for alias in shard_aliases():
+            command.scan(alias, today, self.options)
+
+    def notifications(self, task):
+        return sorted(task.notifications.values_list('kind', 'due_date'))
+
+    def test_notifies_tasks_entering_the_window(self):
+        self.scan(self.today)
+        task = self.task(self.today + timedelta(days=2))
+        self.scan(self.today + timedelta(days=1))
+        self.assertEqual(self.notifications(task), [('due_soon', task.due_date)])
+        self.scan(self.today + timedelta(days=3))
+        self.assertEqual(self.notifications(task), [
+            ('due_soon', task.due_date), ('overdue', task.due_date)])
+
+    def test_missed_days_are_overdue_not_due_soon(self):
+        self.scan(self.today - timedelta(days=10))
+        missed = self.task(self.today - timedelta(days=5))
+        self.scan(self.today)
+        self.assertEqual(self.notifications(missed), [('overdue', missed.due_date)])
+
+    def test_task_rescheduled_into_scanned_window(self):
+        task = self.task(self.today + timedelta(days=30))
+        self.scan(self.today)
+        self.assertEqual(self.notifications(task), [])
+
+        task.due_date = self.today
+        task.save()
+        self.scan(self.today)
+        self.assertEqual(self.notifications(task), [('due_soon', self.today)])
+
+    def test_completed_then_reopened(self):
+        task = self.task(self.today - timedelta(days=1), status='completed')
+        self.scan(self.today)
+        self.assertEqual(self.notifications(task), [])
+
+        task.status = 'todo'
+        task.save()
+        self.scan(self.today)
+        self.assertEqual(self.notifications(task), [('overdue', task.due_date)])
+
+    def test_unchanged_tasks_are_not_rescanned(self):
+        self.task(self.today - timedelta(days=1))
+        self.scan(self.today)
+        checkpoint = ScanCheckpoint.objects.get(
+            name=f'scan_due_tasks:overdue:{self.project._state.db}')
+        checkpoint.updated_through = timezone.now()
+        checkpoint.save()
+        TaskNotification.objects.using(self.project._state.db).all().delete()
+
+        self.scan(self.today)
+        self.assertFalse(TaskNotification.objects.using(self.project._state.db).exists())
+
+
+@requires_shards
+class ShardingTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        reserve_shard_ids()
+        # Consecutive ids, so the users land on different shards
+        self.users = [User.objects.create_user(f'user{i}') for i in range(2)]
+        self.projects = [
+            Project.objects.on_shard(user.pk).create(name='Work', user=user)
+            for user in self.users
+        ]
+
+    def create_tasks(self, count):
+        for i in range(count):
+            project = self.projects[i % 2]
+            project.tasks.create(
+                title=f'Task {i}', due_date=f'2030-01-{i % 5 + 1:02}',
+                priority=('low', 'medium', 'high')[i % 3], user=project.user,
+            )
+
+    def test_rows_stay_on_their_owner_shard(self):
+        for user, project in zip(self.users, self.projects):
+            task = project.tasks.create(title='Task', due_date='2030-01-01', user=user)
+            self.assertEqual(project._state.db, shard_for_user(user.pk))
+            self.assertEqual(task._state.db, project._state.db)
+            self.assertEqual(shard_for_pk(task.pk), task._state.db)
+        self.assertNotEqual(self.projects[0]._state.db, self.projects[1]._state.db)
+
+    def test_fan_out_merges_rows_in_model_ordering(self):
+        self.create_tasks(12)
+        tasks = fan_out(Task.objects.all())
+        self.assertEqual(len(tasks), 12)
+        keys = [(task.due_date, task.priority) for task in tasks]
+        # Meta.ordering is ['due_date', '-priority']
+        self.assertEqual(keys, sorted(sorted(keys, key=lambda key: key[1], reverse=True),
+                                      key=lambda key: key[0]))
+        self.assertEqual(fan_out(Task.objects.all(), limit=3), tasks[:3])
+
+    def test_get_from_shards(self):
+        for project in self.projects:
+            found = get_from_shards(Project.objects.all(), project.pk)
+            self.assertEqual((found.pk, found._state.db), (project.pk, project._state.db))
+        with self.assertRaises(Project.DoesNotExist):
+            get_from_shards(Project.objects.all(), 10 ** 15)
+
+    def test_admin_changelist_queries_do_not_grow_with_rows(self):
+        admin_user = User.objects.create_superuser('root', 'root@example.com', 'secret12')
+        self.client.force_login(admin_user)
+        alias = self.projects[0]._state.db
+
+        def changelist():
+            response = self.client.get(f'/admin/tasks/task/?shard={alias}')
+            self.assertEqual(response.status_code, 200)
+            return response
+
+        self.create_tasks(2)
+        _, few = capture_queries(self, changelist)
+        self.create_tasks(20)
+        _, many = capture_queries(self, changelist)
+        self.assertEqual(len(many), len(few), '\n'.join(many))
+
+    def test_admin_is_read_only(self):
+        admin_user = User.objects.create_superuser('root', 'root@example.com', 'secret12')
+        self.client.force_login(admin_user)
+        project = self.projects[1]
+        self.assertEqual(self.client.get(f'/admin/tasks/project/{project.pk}/change/').status_code, 200)
+        self.assertEqual(self.client.get('/admin/tasks/project/add/').status_code, 403)
+
+
+@requires_shards
+class RebalanceShardsTests(TransactionTestCase):
+    # ATTACH DATABASE can't run inside the transaction TestCase wraps tests in
+    databases = '__all__'
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{i}') for i in range(2)]
+        self.projects = [
+            Project.objects.using(DEFAULT_DB_ALIAS).create(name='Work', user=user)
+            for user in self.users
+        ]
+
+    def rebalance(self):
+        call_command('rebalance_shards', stdout=StringIO())
+
+    def copy_row(self, model, pk, target):
+        """Leave a copy of a default row on `target`, as an interrupted run can"""
+        with connections[target].cursor() as cursor:
+            cursor.execute('ATTACH DATABASE %s AS source',
+                           [str(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])])
+            try:
+                table = model._meta.db_table
+                cursor.execute(f'INSERT INTO main.{table} SELECT * FROM source.{table} WHERE id = %s', [pk])
+            finally:
+                cursor.execute('DETACH DATABASE source')
+
+    def test_tasks_move_with_their_project(self):
+        owner, other = self.users
+        project = self.projects[0]
+        # A legacy task whose user is not the project owner
+        task = Task.objects.using(DEFAULT_DB_ALIAS).create(
+            title='Shared', due_date='2030-01-01', project=project, user=other)
+
+        self.rebalance()
+
+        home = shard_for_user(owner.pk)
+        self.assertFalse(Project.objects.using(DEFAULT_DB_ALIAS).exists())
+        self.assertTrue(Project.objects.using(home).filter(pk=project.pk).exists())
+        self.assertTrue(Task.objects.using(home).filter(pk=task.pk, project_id=project.pk).exists())
+
+    def test_rerun_after_interrupted_copy(self):
+        project = self.projects[0]
+        target = shard_for_user(project.user_id)
+        # Copied to the target but not yet deleted from the source
+        self.copy_row(Project, project.pk, target)
+
+        self.rebalance()
+        self.rebalance()
+
+        self.assertFalse(Project.objects.using(DEFAULT_DB_ALIAS).exists())
+        self.assertEqual(Project.objects.using(target).filter(pk=project.pk).count(), 1)
+
+    def test_id_collision_fails_loudly(self):
+        project = self.projects[0]
+        target = shard_for_user(project.user_id)
+        Project.objects.using(target).create(pk=project.pk, name='Other', user=self.users[0])
+
+        with self.assertRaises(IntegrityError):
+            self.rebalance()
+
+        self.assertTrue(Project.objects.using(DEFAULT_DB_ALIAS).filter(pk=project.pk).exists())
+        self.assertEqual(Project.objects.using(target).get(pk=project.pk).name, 'Other')
+
+    def test_sequences_skip_ids_left_on_default(self):
+        # The run fails, leaving rows on default inside shard_0's id range
+        project = self.projects[0]
+        Project.objects.using(shard_for_user(project.user_id)).create(
+            pk=project.pk, name='Other', user=self.users[0])
+        with self.assertRaises(IntegrityError):
+            self.rebalance()
+
+        used = set(Project.objects.using(DEFAULT_DB_ALIAS).values_list('pk', flat=True))
+        for user in self.users:
+            new = Project.objects.on_shard(user.pk).create(name='New', user=user)
+            self.assertNotIn(new.pk, used)
@@ -26,4 +26,7 @@ urlpatterns = [
     path('admin/tasks/', views.AdminTaskListCreateView.as_view(), name='admin-task-list-create'),
     path('admin/tasks/<int:pk>/', views.AdminTaskDetailView.as_view(), name='admin-task-detail'),
     path('admin/dashboard/stats/', views.admin_dashboard_stats, name='admin-dashboard-stats'),
+    path('admin/admission/stats/', views.admin_admission_stats, name='admin-admission-stats'),
+    path('admin/profiles/', views.admin_profiles, name='admin-profiles'),
+    path('admin/profiles/<str:route>/', views.admin_profile_detail, name='admin-profile-detail'),
 ]
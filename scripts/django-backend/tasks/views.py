@@ -1,11 +1,17 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Q, Count
+from django.http import Http404, HttpResponse
 from datetime import date
+from .admission import admission_stats
+from .profiling import format_folded, load_profiles, load_route_profile
 from .models import Task, Project
+from .sharding import fan_out, fan_out_count, get_from_shards, shard_aliases, shard_for_user
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
@@ -21,6 +27,29 @@ class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_staff
 
+# Sharding helpers for admin views, which see every user's rows
+class FanOutListMixin:
+    def get_shard_aliases(self):
+        user_id = self.request.query_params.get('user', None)
+        if user_id and user_id.isdigit():
+            return [shard_for_user(int(user_id))]
+        return shard_aliases()
+
+    def list(self, request, *args, **kwargs):
+        rows = fan_out(self.filter_queryset(self.get_queryset()), aliases=self.get_shard_aliases())
+        serializer = self.get_serializer(rows, many=True)
+        return Response(serializer.data)
+
+class FanOutObjectMixin:
+    def get_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            obj = get_from_shards(queryset, self.kwargs[self.lookup_field])
+        except ObjectDoesNotExist:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -29,10 +58,10 @@ def register(request):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
+            token = Token.objects.create(user=user)
             
             # Create default project
-            Project.objects.create(
+            Project.objects.on_shard(user.pk).create(
                 name="Personal",
                 description="Personal tasks",
                 color="blue",
@@ -45,6 +74,8 @@ def register(request):
                 'message': 'User registered successfully'
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except ValidationError as e:
+        return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -83,20 +114,20 @@ class ProjectListCreateView(generics.ListCreateAPIView):
     serializer_class = ProjectSerializer
 
     def get_queryset(self):
-        return Project.objects.filter(user=self.request.user)
+        return Project.objects.for_user(self.request.user)
 
 class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProjectSerializer
 
     def get_queryset(self):
-        return Project.objects.filter(user=self.request.user)
+        return Project.objects.for_user(self.request.user)
 
 # User Task Views (No Delete)
 class TaskListCreateView(generics.ListCreateAPIView):
     serializer_class = TaskSerializer
 
     def get_queryset(self):
-        queryset = Task.objects.filter(user=self.request.user)
+        queryset = Task.objects.for_user(self.request.user).select_related('project')
         
         # Filter by project
         project_id = self.request.query_params.get('project', None)
@@ -126,7 +157,7 @@ class TaskDetailView(generics.RetrieveUpdateAPIView):  # Removed DestroyAPIView
     serializer_class = TaskSerializer
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user)
+        return Task.objects.for_user(self.request.user).select_related('project')
 
 # Admin Views
 class AdminUserListView(generics.ListAPIView):
@@ -134,10 +165,10 @@ class AdminUserListView(generics.ListAPIView):
     serializer_class = UserSerializer
     queryset = User.objects.all()
 
-class AdminProjectListCreateView(generics.ListCreateAPIView):
+class AdminProjectListCreateView(FanOutListMixin, generics.ListCreateAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = AdminProjectSerializer
-    queryset = Project.objects.all().select_related('user')
+    queryset = Project.objects.all().prefetch_related('user')
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -146,15 +177,16 @@ class AdminProjectListCreateView(generics.ListCreateAPIView):
             queryset = queryset.filter(user_id=user_id)
         return queryset
 
-class AdminProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AdminProjectDetailView(FanOutObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = AdminProjectSerializer
     queryset = Project.objects.all()
 
-class AdminTaskListCreateView(generics.ListCreateAPIView):
+class AdminTaskListCreateView(FanOutListMixin, generics.ListCreateAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = AdminTaskSerializer
-    queryset = Task.objects.all().select_related('user', 'project')
+    # Users live on the default database, so they can't be joined when sharded
+    queryset = Task.objects.all().select_related('project').prefetch_related('user')
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -183,7 +215,7 @@ class AdminTaskListCreateView(generics.ListCreateAPIView):
         
         return queryset
 
-class AdminTaskDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AdminTaskDetailView(FanOutObjectMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = AdminTaskSerializer
     queryset = Task.objects.all()
@@ -191,7 +223,7 @@ class AdminTaskDetailView(generics.RetrieveUpdateDestroyAPIView):
 @api_view(['GET'])
 def dashboard_stats(request):
     try:
-        user_tasks = Task.objects.filter(user=request.user)
+        user_tasks = Task.objects.for_user(request.user)
         
         # Filter by project if specified
         project_id = request.query_params.get('project', None)
@@ -223,22 +255,22 @@ def admin_dashboard_stats(request):
     try:
         # Overall statistics
         total_users = User.objects.filter(is_staff=False).count()
-        total_projects = Project.objects.count()
-        total_tasks = Task.objects.count()
+        total_projects = fan_out_count(Project.objects.all())
+        total_tasks = fan_out_count(Task.objects.all())
         
         # Task status breakdown
-        todo_tasks = Task.objects.filter(status='todo').count()
-        in_progress_tasks = Task.objects.filter(status='in-progress').count()
-        completed_tasks = Task.objects.filter(status='completed').count()
-        overdue_tasks = Task.objects.filter(
+        todo_tasks = fan_out_count(Task.objects.filter(status='todo'))
+        in_progress_tasks = fan_out_count(Task.objects.filter(status='in-progress'))
+        completed_tasks = fan_out_count(Task.objects.filter(status='completed'))
+        overdue_tasks = fan_out_count(Task.objects.filter(
             due_date__lt=date.today(),
             status__in=['todo', 'in-progress']
-        ).count()
+        ))
         
         # Recent activity
         recent_users = User.objects.filter(is_staff=False).order_by('-date_joined')[:5]
-        recent_projects = Project.objects.order_by('-created_at')[:5]
-        recent_tasks = Task.objects.order_by('-created_at')[:5]
+        recent_projects = fan_out(Project.objects.order_by('-created_at'), limit=5)
+        recent_tasks = fan_out(Task.objects.order_by('-created_at'), limit=5)
         
         return Response({
             'total_users': total_users,
@@ -254,3 +286,25 @@ def admin_dashboard_stats(request):
         })
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_admission_stats(request):
+    return Response(admission_stats())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_profiles(request):
+    return Response([
+        {'route': route, 'samples': sum(stacks.values())}
+        for route, stacks in sorted(load_profiles().items())
+    ])
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_profile_detail(request, route):
+    stacks = load_route_profile(route)
+    if not stacks:
+        raise Http404
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    return HttpResponse(format_folded(stacks), content_type='text/plain')
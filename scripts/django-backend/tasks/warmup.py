@@ -0,0 +1,44 @@
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+from .serializers import (
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+    UserSerializer,
+    TaskSerializer,
+    ProjectSerializer,
+    AdminTaskSerializer,
+    AdminProjectSerializer,
+)
+
+WARM_SERIALIZERS = (
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+    UserSerializer,
+    TaskSerializer,
+    ProjectSerializer,
+    AdminTaskSerializer,
+    AdminProjectSerializer,
+)
+
+
+def warm_up():
+    """Do the lazy first-request work up front and return the seconds it took.
+
+    Populates the URL resolver, builds every serializer's fields once to prime
+    the model metadata caches they rely on, and opens the database connection so the
+    connection pragmas are applied before the worker accepts traffic.
+    """
+    started = time.perf_counter()
+
+    get_resolver()._populate()
+
+    for serializer_class in WARM_SERIALIZERS:
+        serializer_class().fields
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+    return time.perf_counter() - started
@@ -36,7 +36,8 @@ def setup_django_backend():
         
         print("Django backend setup complete!")
         print("Superuser created: username='admin', password='admin123'")
-        print("To start the server, run: python manage.py runserver")
+        print("To start the development server, run: python manage.py runserver")
+        print("To start the production server, run: python manage.py serve")
         
     except subprocess.CalledProcessError as e:
         print(f"Error setting up Django backend: {e}")